@@ -0,0 +1,37 @@
+"""Default follow-up source filter GIN index
+
+Revision ID: 2d7f3c8a1b4e
+Revises: 47a76ff0f3ce
+Create Date: 2026-10-15 09:12:41.503218
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7f3c8a1b4e'
+down_revision = '47a76ff0f3ce'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_default_followup_source_filter',
+            'defaultfollowuprequests',
+            ['source_filter'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'source_filter': 'jsonb_path_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_default_followup_source_filter',
+            table_name='defaultfollowuprequests',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,59 @@
+"""Follow-up request listing index
+
+Revision ID: b61e4f0c9d27
+Revises: 2d7f3c8a1b4e
+Create Date: 2026-10-15 11:47:05.318842
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b61e4f0c9d27'
+down_revision = '2d7f3c8a1b4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_followuprequests_allocation_id_created_at',
+            'followuprequests',
+            ['allocation_id', 'created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_followuprequests_status',
+            table_name='followuprequests',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_followuprequests_allocation_id',
+            table_name='followuprequests',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_followuprequests_allocation_id',
+            'followuprequests',
+            ['allocation_id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_followuprequests_status',
+            'followuprequests',
+            ['status'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_followuprequests_allocation_id_created_at',
+            table_name='followuprequests',
+            postgresql_concurrently=True,
+        )
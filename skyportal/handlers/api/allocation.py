@@ -2,7 +2,7 @@ import astropy
 from astroplan.moon import moon_phase_angle
 from marshmallow.exceptions import ValidationError
 import sqlalchemy as sa
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy import func
 import io
 import matplotlib
@@ -19,9 +19,25 @@ from ...models import (
     Allocation,
     AllocationUser,
     Instrument,
+    Obj,
 )
 
 
+def single_allocation_options():
+    """Loader options for serializing a single allocation with its requests.
+
+    The rise/set times walk allocation -> instrument -> telescope and
+    request -> obj, so everything is loaded up front.
+    """
+    return [
+        joinedload(Allocation.instrument).joinedload(Instrument.telescope),
+        selectinload(Allocation.requests)
+        .joinedload(FollowupRequest.obj)
+        .selectinload(Obj.thumbnails),
+        selectinload(Allocation.requests).joinedload(FollowupRequest.requester),
+    ]
+
+
 class AllocationHandler(BaseHandler):
     @auth_or_token
     def get(self, allocation_id=None):
@@ -79,7 +95,7 @@ class AllocationHandler(BaseHandler):
                 except ValueError:
                     return self.error("Allocation ID must be an integer.")
                 allocations = Allocation.select(
-                    self.current_user, options=[joinedload(Allocation.requests)]
+                    self.current_user, options=single_allocation_options()
                 )
 
                 allocations = allocations.where(Allocation.id == allocation_id)
@@ -88,6 +104,8 @@ class AllocationHandler(BaseHandler):
                     return self.error("Could not retrieve allocation.")
 
                 allocation_data = allocation.to_dict()
+                # the instrument is only eager-loaded for the telescope lookups
+                allocation_data.pop('instrument', None)
                 requests = []
                 for request in allocation_data['requests']:
                     request_data = request.to_dict()
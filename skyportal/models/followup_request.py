@@ -6,14 +6,12 @@ __all__ = [
 ]
 
 from astropy import coordinates as ap_coord
-from astropy import time as ap_time
 from astropy import units as u
 from datetime import datetime, timedelta
-import operator  # noqa: F401
 
 import sqlalchemy as sa
 from sqlalchemy import event, inspect
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, selectinload
 from sqlalchemy.dialects import postgresql as psql
 from sqlalchemy.sql.expression import cast
 
@@ -127,6 +125,15 @@ class DefaultFollowupRequest(Base):
         doc="Source filter for default follow-up request.",
     )
 
+    __table_args__ = (
+        sa.Index(
+            "ix_default_followup_source_filter",
+            "source_filter",
+            postgresql_using="gin",
+            postgresql_ops={"source_filter": "jsonb_path_ops"},
+        ),
+    )
+
 
 DefaultFollowupRequestTargetGroup = join_model(
     'default_followup_groups',
@@ -199,12 +206,11 @@ class FollowupRequest(Base):
         sa.String(),
         nullable=False,
         default="pending submission",
-        index=True,
         doc="The status of the request.",
     )
 
     allocation_id = sa.Column(
-        sa.ForeignKey('allocations.id', ondelete='CASCADE'), nullable=False, index=True
+        sa.ForeignKey('allocations.id', ondelete='CASCADE'), nullable=False
     )
     allocation = relationship('Allocation', back_populates='requests')
 
@@ -255,12 +261,9 @@ class FollowupRequest(Base):
         if observer is None:
             return None
 
-        sunset = self.allocation.instrument.telescope.next_sunset(
-            ap_time.Time.now()
-        ).reshape((1,))
-        sunrise = self.allocation.instrument.telescope.next_sunrise(
-            ap_time.Time.now()
-        ).reshape((1,))
+        sunset, sunrise = self.allocation.instrument.telescope.next_sunset_and_sunrise()
+        sunset = sunset.reshape((1,))
+        sunrise = sunrise.reshape((1,))
 
         coord = ap_coord.SkyCoord(self.obj.ra, self.obj.dec, unit='deg')
 
@@ -286,11 +289,25 @@ class FollowupRequest(Base):
         if observer is None:
             return None
 
-        sunset = self.allocation.instrument.telescope.next_sunset(ap_time.Time.now())
+        sunset, _ = self.allocation.instrument.telescope.next_sunset_and_sunrise()
         coord = ap_coord.SkyCoord(self.obj.ra, self.obj.dec, unit='deg')
         return observer.target_set_time(sunset, coord, which='next', horizon=altitude)
 
 
+# Listing index. Follow-up requests are listed per instrument (i.e. per
+# allocation) within a creation date range. Status is only ever filtered
+# with substring or inequality matches, which a plain index cannot serve.
+# allocation_id leads the index, so it also serves lookups by allocation
+# alone.
+FollowupRequest.__table_args__ = (
+    sa.Index(
+        'ix_followuprequests_allocation_id_created_at',
+        FollowupRequest.allocation_id,
+        FollowupRequest.created_at,
+    ),
+)
+
+
 FollowupRequestTargetGroup = join_model(
     'request_groups', FollowupRequest, Group, overlaps='target_groups'
 )
@@ -319,33 +336,38 @@ def add_followup(mapper, connection, target):
 
         from skyportal.handlers.api.followup_request import post_followup_request
 
-        comp_function = getattr(operator, 'eq')
         target_data = target.to_dict()
 
-        requests_query = sa.select(DefaultFollowupRequest)
+        # load the allocations and their instruments up front, as
+        # post_followup_request needs each request's allocation.instrument
+        requests_query = sa.select(DefaultFollowupRequest).options(
+            selectinload(DefaultFollowupRequest.allocation).joinedload(
+                Allocation.instrument
+            )
+        )
+        # containment (@>) rather than equality on a subscript, so that the
+        # lookup can use the GIN index on source_filter
         requests_query = requests_query.where(
-            comp_function(
-                DefaultFollowupRequest.source_filter['classification'],
-                cast(target_data['classification'], psql.JSONB),
+            DefaultFollowupRequest.source_filter.op('@>')(
+                cast({'classification': target_data['classification']}, psql.JSONB)
             )
         )
         default_followup_requests = session.scalars(requests_query).all()
 
-        start_date = str(datetime.utcnow()).replace("T", "")
-        end_date = str(datetime.utcnow() + timedelta(days=1)).replace("T", "")
+        now = datetime.utcnow()
+        start_date = now.isoformat(sep=' ', timespec='seconds')
+        end_date = (now + timedelta(days=1)).isoformat(sep=' ', timespec='seconds')
         obj_id = target_data['obj_id']
-        for ii, default_followup_request in enumerate(default_followup_requests):
+        for default_followup_request in default_followup_requests:
             try:
-                followup_request = default_followup_request.to_dict()
-                allocation_id = followup_request['allocation_id']
                 payload = {
-                    **followup_request['payload'],
+                    **default_followup_request.payload,
                     'start_date': start_date,
                     'end_date': end_date,
                 }
                 data = {
                     'payload': payload,
-                    'allocation_id': allocation_id,
+                    'allocation_id': default_followup_request.allocation_id,
                     'obj_id': obj_id,
                 }
                 post_followup_request(data, session, refresh_source=False)
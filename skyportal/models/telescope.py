@@ -187,6 +187,24 @@ class Telescope(Base):
             time = ap_time.Time.now()
         return observer.sun_rise_time(time, which='next')
 
+    def next_sunset_and_sunrise(self):
+        """The astropy timestamps of the next sunset and sunrise at this site,
+        as of the current minute. The result is cached on the instance for
+        that minute, so that computing rise/set times for many targets at
+        this telescope only solves for the Sun once."""
+        time = ap_time.Time.now()
+        minute = int(time.unix // 60)
+        try:
+            cached_minute, sun_times = self._sun_times
+            if cached_minute == minute:
+                return sun_times
+        except AttributeError:
+            pass
+
+        sun_times = (self.next_sunset(time), self.next_sunrise(time))
+        self._sun_times = (minute, sun_times)
+        return sun_times
+
     def next_twilight_evening_nautical(self, time=None):
         """The astropy timestamp of the next evening nautical (-12 degree)
         twilight at this site. If time=None, uses the current time."""
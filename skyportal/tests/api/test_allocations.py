@@ -1,3 +1,9 @@
+import astropy.time
+import sqlalchemy as sa
+from sqlalchemy.orm import raiseload
+
+from skyportal.handlers.api.allocation import single_allocation_options
+from skyportal.models import Allocation, DBSession
 from skyportal.tests import api
 
 
@@ -157,3 +163,38 @@ def test_delete_allocation_cascades_to_requests(
     status, data = api('GET', f'followup_request/{request_id}', token=super_admin_token)
     assert status == 400
     assert "Could not retrieve followup request" in data['message']
+
+
+def test_get_allocation_loads_requests_up_front(
+    public_group_sedm_allocation, public_source_followup_request, public_thumbnail
+):
+    # a fresh session so nothing is served from the fixtures' identity map
+    with sa.orm.Session(bind=DBSession.get_bind()) as session:
+        allocation = session.scalars(
+            sa.select(Allocation)
+            .where(Allocation.id == public_group_sedm_allocation.id)
+            .options(*single_allocation_options(), raiseload('*', sql_only=True))
+        ).first()
+
+        # everything the single-allocation GET touches must already be loaded
+        allocation.instrument.telescope.ephemeris(astropy.time.Time.now())
+        assert len(allocation.requests) == 1
+        for request in allocation.requests:
+            request.requester.to_dict()
+            request.obj.to_dict()
+            assert len(request.obj.thumbnails) > 0
+            request.rise_time()
+            request.set_time()
+
+
+def test_get_allocation_omits_instrument(
+    public_group_sedm_allocation, public_source_followup_request, super_admin_token
+):
+    status, data = api(
+        'GET', f'allocation/{public_group_sedm_allocation.id}', token=super_admin_token
+    )
+    assert status == 200
+    assert data['status'] == 'success'
+    assert 'instrument' not in data['data']
+    assert 'telescope' in data['data']
+    assert len(data['data']['requests']) == 1
@@ -0,0 +1,112 @@
+import healpy as hp
+import ligo.skymap.bayestar as ligo_bayestar
+import ligo.skymap.moc
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.coordinates import SkyCoord
+from astropy.table import Table
+
+from skyportal.utils.gcn import (
+    _apply_occultation,
+    _get_contour_order,
+    _get_pixel_separation,
+    from_cone,
+)
+
+
+def make_moc_skymap(order, npix, probdensity=None):
+    """Multi-order skymap made of the first `npix` NESTED pixels at `order`,
+    with a uniform (normalized) probability density unless given."""
+    ipix = np.arange(npix)
+    uniq = ligo.skymap.moc.nest2uniq(order, ipix)
+    if probdensity is None:
+        probdensity = np.full(npix, 1 / (npix * hp.nside2pixarea(2**order)))
+    return Table([uniq, probdensity], names=['UNIQ', 'PROBDENSITY'])
+
+
+# degree-scale (GCN error circles) and arcsecond-scale (spatial catalogs)
+@pytest.mark.parametrize('error', [5.0, 1.0 / 3600])
+def test_from_cone_pixel_separation(error):
+    ra, dec = 123.4, -45.6
+    skymap = from_cone(ra, dec, error)
+
+    order, ipix = ligo.skymap.moc.uniq2nest(np.asarray(skymap['uniq']))
+    nside = hp.order2nside(int(order[0]))
+    distance = _get_pixel_separation(nside, ipix, hp.ang2vec(ra, dec, lonlat=True))
+
+    center = SkyCoord(ra * u.deg, dec * u.deg)
+    pixel_ra, pixel_dec = hp.pix2ang(nside, ipix, nest=True, lonlat=True)
+    expected = SkyCoord(pixel_ra * u.deg, pixel_dec * u.deg).separation(center)
+    np.testing.assert_allclose(distance, expected.rad, rtol=1e-8, atol=1e-14)
+
+    # the error circle is fully covered, and the map stays normalized
+    assert distance.max() > 3.5 * np.deg2rad(error)
+    pixel_area = ligo.skymap.moc.uniq2pixarea(np.asarray(skymap['uniq']))
+    np.testing.assert_allclose(
+        np.sum(np.asarray(skymap['probdensity']) * pixel_area), 1.0, rtol=1e-5
+    )
+
+
+def test_contour_order_compact_skymap():
+    # ~1 deg^2 at order 10: needs the full contouring resolution
+    skymap = make_moc_skymap(10, 300)
+    assert _get_contour_order(skymap, max_order=9) == 9
+
+
+def test_contour_order_broad_skymap():
+    # ~1000 deg^2 made of order 6 (~0.84 deg^2) pixels
+    npix = int(round(1000 / hp.nside2pixarea(64, degrees=True)))
+    skymap = make_moc_skymap(6, npix)
+    assert _get_contour_order(skymap, max_order=9) == 6
+
+
+def test_contour_order_zero_probability():
+    skymap = make_moc_skymap(6, 100, probdensity=np.zeros(100))
+    assert _get_contour_order(skymap, max_order=9) == 9
+
+
+def apply_occultation_by_reordering(skymap, occulted, nside):
+    """Reference implementation: mask in RING ordering, then reorder back."""
+    order = hp.nside2order(nside)
+    skymap_flat = ligo_bayestar.rasterize(skymap, order)['PROB']
+    skymap_flat = hp.reorder(skymap_flat, 'NESTED', 'RING')
+    skymap_flat[occulted] = 0.0
+    skymap_flat = skymap_flat / skymap_flat.sum()
+    skymap_flat = hp.reorder(skymap_flat, 'RING', 'NESTED')
+    return ligo_bayestar.derasterize(Table([skymap_flat], names=['PROB']))
+
+
+def test_apply_occultation_matches_reordering():
+    nside = 128
+    order = hp.nside2order(nside)
+    npix = hp.nside2npix(nside)
+    rng = np.random.default_rng(0)
+    skymap = make_moc_skymap(order, npix, probdensity=rng.uniform(size=npix))
+
+    # Earth occults a 67.5 deg radius circle, in RING ordering
+    occulted = hp.query_disc(
+        nside, hp.ang2vec(30.0, 10.0, lonlat=True), np.deg2rad(67.5), nest=False
+    )
+
+    result = _apply_occultation(skymap, occulted, nside)
+    expected = apply_occultation_by_reordering(skymap, occulted, nside)
+
+    result_flat = ligo_bayestar.rasterize(result, order)['PROB']
+    expected_flat = ligo_bayestar.rasterize(expected, order)['PROB']
+    np.testing.assert_allclose(result_flat, expected_flat, rtol=1e-12, atol=0)
+    assert np.all(result_flat[hp.ring2nest(nside, occulted)] == 0)
+    np.testing.assert_allclose(result_flat.sum(), 1.0)
+
+
+def test_apply_occultation_nothing_occulted():
+    nside = 128
+    # all the probability is in the first base pixel (around ra=45, dec=42)
+    skymap = make_moc_skymap(hp.nside2order(nside), 1000)
+
+    # a circle on the opposite side of the sky, in RING ordering
+    occulted = hp.query_disc(
+        nside, hp.ang2vec(225.0, -42.0, lonlat=True), np.deg2rad(20.0), nest=False
+    )
+
+    assert _apply_occultation(skymap, occulted, nside) is skymap
@@ -14,25 +14,55 @@ import ligo.skymap.distance
 import ligo.skymap.io
 import ligo.skymap.moc
 import ligo.skymap.postprocess
+import lxml.etree
 import numpy as np
 import requests
-import scipy
-from astropy.coordinates import ICRS, Angle, Latitude, Longitude, SkyCoord
+import scipy.stats
+from astropy.coordinates import ICRS, Angle, Latitude, Longitude
 from astropy.table import Table
 from astropy.time import Time
 from astropy_healpix import HEALPix, nside_to_level, pixel_resolution_to_nside
 from mocpy import MOC
 
+# AMON reports 90% error radii; dividing by this factor converts them to the
+# 1-sigma radii reported by all other missions.
+_AMON_SIGMA_FACTOR = float(scipy.stats.chi(df=2).ppf(0.95))
+
+
+_TRIGGER_ID_XPATH = lxml.etree.XPath(".//Param[@name='TrigID']")
+_DATEOBS_XPATH = lxml.etree.XPath(
+    "./WhereWhen/*[local-name()='ObsDataLocation']"
+    "/*[local-name()='ObservationLocation']"
+    "/*[local-name()='AstroCoords']"
+    "[@coord_system_id='UTC-FK5-GEO']"
+    "/Time/TimeInstant/ISOTime"
+)
+_GW_SKYMAP_URL_XPATH = lxml.etree.XPath(
+    "./What/Group[@type='GW_SKYMAP']/*[@name='skymap_fits']/@value"
+)
+
+
+def _get_params_by_name(root):
+    """Index the Param elements of a GCN notice by name in a single pass.
+    As with root.find, the first occurrence of each name wins."""
+    params = {}
+    for elem in root.iterfind(".//Param"):
+        params.setdefault(elem.attrib.get('name'), elem)
+    return params
+
+
+def _get_mission(root):
+    """Get the event stream (mission) name from a GCN notice's IVORN."""
+    return urlparse(root.attrib['ivorn']).path.lstrip('/')
+
 
 def get_trigger(root):
     """Get the trigger ID from a GCN notice."""
 
-    property_name = "TrigID"
-    path = f".//Param[@name='{property_name}']"
-    elem = root.find(path)
-    if elem is None:
+    elems = _TRIGGER_ID_XPATH(root)
+    if not elems:
         return None
-    value = elem.attrib.get('value', None)
+    value = elems[0].attrib.get('value', None)
     if value is not None:
         value = int(value)
 
@@ -42,16 +72,7 @@ def get_trigger(root):
 def get_dateobs(root):
     """Get the UTC event time from a GCN notice, rounded to the nearest second,
     as a datetime.datetime object."""
-    dateobs = Time(
-        root.find(
-            "./WhereWhen/{*}ObsDataLocation"
-            "/{*}ObservationLocation"
-            "/{*}AstroCoords"
-            "[@coord_system_id='UTC-FK5-GEO']"
-            "/Time/TimeInstant/ISOTime"
-        ).text,
-        precision=0,
-    )
+    dateobs = Time(_DATEOBS_XPATH(root)[0].text, precision=0)
 
     # FIXME: https://github.com/astropy/astropy/issues/7179
     dateobs = Time(dateobs.iso)
@@ -61,8 +82,10 @@ def get_dateobs(root):
 
 def get_tags(root):
     """Get source classification tag strings from GCN notice."""
+    params = _get_params_by_name(root)
+
     # Get event stream.
-    mission = urlparse(root.attrib['ivorn']).path.lstrip('/')
+    mission = _get_mission(root)
     yield mission
 
     # What type of burst is this: GRB or GW?
@@ -74,7 +97,7 @@ def get_tags(root):
         if value == 'process.variation.burst;em.gamma':
             # Is this a GRB at all?
             try:
-                value = root.find(".//Param[@name='GRB_Identified']").attrib['value']
+                value = params.get('GRB_Identified').attrib['value']
             except AttributeError:
                 yield 'GRB'
             else:
@@ -113,7 +136,7 @@ def get_tags(root):
 
     # Is this a short GRB, or a long GRB?
     try:
-        value = root.find(".//Param[@name='Long_short']").attrib['value']
+        value = params.get('Long_short').attrib['value']
     except AttributeError:
         pass
     else:
@@ -123,7 +146,7 @@ def get_tags(root):
     # Gaaaaaah! Alerts of type FERMI_GBM_SUBTHRESH store the
     # classification in a different property!
     try:
-        value = root.find(".//Param[@name='Duration_class']").attrib['value'].title()
+        value = params.get('Duration_class').attrib['value'].title()
     except AttributeError:
         pass
     else:
@@ -131,13 +154,15 @@ def get_tags(root):
             yield value.lower()
 
     # Get LIGO/Virgo source classification, if present.
-    classifications = [
-        (float(elem.attrib['value']), elem.attrib['name'])
-        for elem in root.iterfind("./What/Group[@type='Classification']/Param")
-    ]
-    if classifications:
-        _, classification = max(classifications)
-        yield classification
+    classification = max(
+        (
+            (float(elem.attrib['value']), elem.attrib['name'])
+            for elem in root.iterfind("./What/Group[@type='Classification']/Param")
+        ),
+        default=None,
+    )
+    if classification is not None:
+        yield classification[1]
 
     search = root.find("./What/Param[@name='Search']")
     if search is not None:
@@ -145,7 +170,7 @@ def get_tags(root):
 
     # Get Instruments, if present.
     try:
-        value = root.find(".//Param[@name='Instruments']").attrib['value']
+        value = params.get('Instruments').attrib['value']
     except AttributeError:
         pass
     else:
@@ -197,13 +222,10 @@ def get_skymap_url(root, notice_type, timeout=10):
         url = root.find("./What/Param[@name='HealPix_URL']").attrib['value']
 
     # Try LVC convention
-    skymap = root.find("./What/Group[@type='GW_SKYMAP']")
-    if skymap is not None and url is None:
-        children = skymap.getchildren()
-        for child in children:
-            if child.attrib['name'] == 'skymap_fits':
-                url = child.attrib['value']
-                break
+    if url is None:
+        skymap_urls = _GW_SKYMAP_URL_XPATH(root)
+        if skymap_urls:
+            url = str(skymap_urls[0])
 
     if url is not None:
         # we have a URL, but is it available? We don't want to download the file here,
@@ -229,7 +251,7 @@ def is_retraction(root):
 
 def get_skymap_cone(root):
     ra, dec, error = None, None, None
-    mission = urlparse(root.attrib['ivorn']).path.lstrip('/')
+    mission = _get_mission(root)
     # Try error cone
     loc = root.find('./WhereWhen/ObsDataLocation/ObservationLocation')
     if loc is None:
@@ -247,7 +269,7 @@ def get_skymap_cone(root):
     # Apparently, all experiments *except* AMON report a 1-sigma error radius.
     # AMON reports a 90% radius, so for AMON, we have to convert.
     if mission == 'AMON':
-        error /= scipy.stats.chi(df=2).ppf(0.95)
+        error /= _AMON_SIGMA_FACTOR
 
     return ra, dec, error
 
@@ -331,24 +353,29 @@ def get_properties(root):
         "signalness",
         "energy",
     ]
-    property_dict = {}
-    for property_name in property_names:
-        path = f".//Param[@name='{property_name}']"
-        elem = root.find(path)
-        if elem is None:
-            continue
-        value = elem.attrib.get('value', None)
-        if value is not None:
-            value = float(value)
-            property_dict[property_name] = value
+    params = _get_params_by_name(root)
+    property_dict = {
+        property_name: float(params[property_name].attrib['value'])
+        for property_name in property_names
+        if property_name in params and 'value' in params[property_name].attrib
+    }
 
     return property_dict
 
 
+def _get_pixel_separation(nside, ipix, center_xyz):
+    """Angular distance in radians between the centers of the NESTED pixels
+    `ipix` and the unit vector `center_xyz`. This works on the unit vectors
+    directly rather than through SkyCoord.separation, and uses the chord
+    length, which stays accurate for arcsecond-scale separations."""
+    xyz = np.asarray(hp.pix2vec(nside, ipix, nest=True))
+    chord = np.linalg.norm(xyz - center_xyz[:, np.newaxis], axis=0)
+    return 2 * np.arcsin(np.clip(0.5 * chord, 0.0, 1.0))
+
+
 def from_cone(ra, dec, error, n_sigma=4):
     localization_name = f"{ra:.5f}_{dec:.5f}_{error:.5f}"
 
-    center = SkyCoord(ra * u.deg, dec * u.deg)
     radius = error * u.deg
 
     # Determine resolution such that there are at least
@@ -358,7 +385,16 @@ def from_cone(ra, dec, error, n_sigma=4):
     )
 
     # Find all pixels in the 4-sigma error circle.
-    ipix = hpx.cone_search_skycoord(center, n_sigma * radius)
+    center_xyz = hp.ang2vec(ra, dec, lonlat=True)
+    # inclusive=True keeps every pixel overlapping the circle, as
+    # cone_search_skycoord did, not only those whose centers are inside it
+    ipix = hp.query_disc(
+        hpx.nside,
+        center_xyz,
+        np.deg2rad(n_sigma * error),
+        inclusive=True,
+        nest=True,
+    )
 
     # Convert to multi-resolution pixel indices and sort.
     uniq = ligo.skymap.moc.nest2uniq(nside_to_level(hpx.nside), ipix.astype(np.int64))
@@ -367,9 +403,11 @@ def from_cone(ra, dec, error, n_sigma=4):
     uniq = uniq[i]
 
     # Evaluate Gaussian.
-    distance = hpx.healpix_to_skycoord(ipix).separation(center)
+    distance = _get_pixel_separation(hpx.nside, ipix, center_xyz)
+    # Single precision is ample for a synthetic Gaussian and halves the
+    # size of the probability density array.
     probdensity = np.exp(
-        -0.5 * np.square(distance / radius).to_value(u.dimensionless_unscaled)
+        -0.5 * np.square(distance / np.deg2rad(error)), dtype=np.float32
     )
     probdensity /= probdensity.sum() * hpx.pixel_area.to_value(u.steradian)
 
@@ -384,9 +422,10 @@ def from_cone(ra, dec, error, n_sigma=4):
 
 def from_polygon(localization_name, polygon):
 
-    xyz = [hp.ang2vec(r, d, lonlat=True) for r, d in polygon]
+    ra, dec = np.asarray(polygon, dtype=np.float64).T
+    xyz = hp.ang2vec(ra, dec, lonlat=True)
     hpx = HEALPix(1024, 'nested', frame=ICRS())
-    ipix = hp.query_polygon(hpx.nside, np.array(xyz), nest=True)
+    ipix = hp.query_polygon(hpx.nside, xyz, nest=True)
 
     # Convert to multi-resolution pixel indices and sort.
     uniq = ligo.skymap.moc.nest2uniq(nside_to_level(hpx.nside), ipix.astype(np.int64))
@@ -394,9 +433,10 @@ def from_polygon(localization_name, polygon):
     ipix = ipix[i]
     uniq = uniq[i]
 
-    # Evaluate Gaussian.
-    probdensity = np.ones(ipix.shape)
-    probdensity /= probdensity.sum() * hpx.pixel_area.to_value(u.steradian)
+    # Uniform probability density over the polygon.
+    probdensity = np.full(
+        ipix.shape, 1 / (ipix.size * hpx.pixel_area.to_value(u.steradian))
+    )
 
     skymap = {
         'localization_name': localization_name,
@@ -439,44 +479,48 @@ def from_ellipse(localization_name, ra, dec, amaj, amin, phi):
     return skymap
 
 
+def _get_col(skymap, name):
+    """Get a skymap column as a list, or None if the column is missing.
+    Lists are what the ARRAY columns of Localization expect."""
+    try:
+        col = skymap[name]
+    except KeyError:
+        return None
+    else:
+        return col.tolist()
+
+
 def from_bytes(arr):
-    def get_col(m, name):
-        try:
-            col = m[name]
-        except KeyError:
-            return None
-        else:
-            return col.tolist()
+    # partition rather than split so that the (possibly multi-megabyte)
+    # payload is not copied into an intermediate list
+    header, sep, payload = arr.partition('base64,')
+    if not sep:
+        header, payload = '', header
+    filename = header.split("name=")[-1].replace(";", "")
+    # the localization name might contain things like '%2B' for '+', or '%3A' for ':'
+    # make sure that these are converted to the correct characters
+    filename = urllib.parse.unquote(filename)
+    data = base64.b64decode(payload)
 
     with tempfile.NamedTemporaryFile(suffix=".fits.gz", mode="wb") as f:
-        arrSplit = arr.split('base64,')
-        filename = arrSplit[0].split("name=")[-1].replace(";", "")
-        # the localization name might contain things like '%2B' for '+', or '%3A' for ':'
-        # make sure that these are converted to the correct characters
-        filename = urllib.parse.unquote(filename)
-        f.write(base64.b64decode(arrSplit[-1]))
+        f.write(data)
         f.flush()
+        del data
 
         skymap = ligo.skymap.io.read_sky_map(f.name, moc=True)
 
         nside = 128
         occulted = get_occulted(f.name, nside=nside)
         if occulted is not None:
-            order = hp.nside2order(nside)
-            skymap_flat = ligo_bayestar.rasterize(skymap, order)['PROB']
-            skymap_flat = hp.reorder(skymap_flat, 'NESTED', 'RING')
-            skymap_flat[occulted] = 0.0
-            skymap_flat = skymap_flat / skymap_flat.sum()
-            skymap_flat = hp.reorder(skymap_flat, 'RING', 'NESTED')
-            skymap = ligo_bayestar.derasterize(Table([skymap_flat], names=['PROB']))
+            skymap = _apply_occultation(skymap, occulted, nside)
 
         skymap = {
             'localization_name': filename,
-            'uniq': get_col(skymap, 'UNIQ'),
-            'probdensity': get_col(skymap, 'PROBDENSITY'),
-            'distmu': get_col(skymap, 'DISTMU'),
-            'distsigma': get_col(skymap, 'DISTSIGMA'),
-            'distnorm': get_col(skymap, 'DISTNORM'),
+            'uniq': _get_col(skymap, 'UNIQ'),
+            'probdensity': _get_col(skymap, 'PROBDENSITY'),
+            'distmu': _get_col(skymap, 'DISTMU'),
+            'distsigma': _get_col(skymap, 'DISTSIGMA'),
+            'distnorm': _get_col(skymap, 'DISTNORM'),
         }
 
     return skymap
@@ -492,26 +536,43 @@ def get_occulted(url, nside=64):
     if (ra is None) or (dec is None) or (error is None):
         return None
 
-    center = SkyCoord(ra * u.deg, dec * u.deg)
-    radius = error * u.deg
-
-    hpx = HEALPix(nside, 'ring', frame=ICRS())
-
     # Find all pixels in the circle.
-    ipix = hpx.cone_search_skycoord(center, radius)
+    center_xyz = hp.ang2vec(ra, dec, lonlat=True)
+    # inclusive=True keeps every pixel overlapping the circle, so that the
+    # Earth limb is fully masked
+    ipix = hp.query_disc(
+        nside, center_xyz, np.deg2rad(error), inclusive=True, nest=False
+    )
 
     return ipix
 
 
-def from_url(url):
-    def get_col(m, name):
-        try:
-            col = m[name]
-        except KeyError:
-            return None
-        else:
-            return col.tolist()
+def _apply_occultation(skymap, occulted, nside):
+    """Zero out the occulted part of a multi-order skymap and renormalize.
+    `occulted` holds RING-ordered pixel indices at the given nside, as
+    returned by get_occulted.
+
+    If the occulted pixels carry no probability, the original skymap is
+    returned unchanged, including any DISTMU/DISTSIGMA/DISTNORM columns.
+    Otherwise the skymap is re-derived from the masked map flattened at
+    nside, and only carries PROBDENSITY."""
+
+    order = hp.nside2order(nside)
+    skymap_flat = ligo_bayestar.rasterize(skymap, order)['PROB']
+
+    # The rasterized map is NESTED; convert the (small) list of occulted
+    # pixels rather than reordering the whole map to RING and back.
+    occulted = hp.ring2nest(nside, occulted)
+    if not skymap_flat[occulted].any():
+        # nothing to mask, keep the original multi-order skymap
+        return skymap
+
+    skymap_flat[occulted] = 0.0
+    skymap_flat /= skymap_flat.sum()
+    return ligo_bayestar.derasterize(Table([skymap_flat], names=['PROB']))
 
+
+def from_url(url):
     filename = os.path.basename(urlparse(url).path)
 
     skymap = ligo.skymap.io.read_sky_map(url, moc=True)
@@ -519,36 +580,65 @@ def from_url(url):
     nside = 128
     occulted = get_occulted(url, nside=nside)
     if occulted is not None:
-        order = hp.nside2order(nside)
-        skymap_flat = ligo_bayestar.rasterize(skymap, order)['PROB']
-        skymap_flat = hp.reorder(skymap_flat, 'NESTED', 'RING')
-        skymap_flat[occulted] = 0.0
-        skymap_flat = skymap_flat / skymap_flat.sum()
-        skymap_flat = hp.reorder(skymap_flat, 'RING', 'NESTED')
-        skymap = ligo_bayestar.derasterize(Table([skymap_flat], names=['PROB']))
+        skymap = _apply_occultation(skymap, occulted, nside)
 
     skymap = {
         'localization_name': filename,
-        'uniq': get_col(skymap, 'UNIQ'),
-        'probdensity': get_col(skymap, 'PROBDENSITY'),
-        'distmu': get_col(skymap, 'DISTMU'),
-        'distsigma': get_col(skymap, 'DISTSIGMA'),
-        'distnorm': get_col(skymap, 'DISTNORM'),
+        'uniq': _get_col(skymap, 'UNIQ'),
+        'probdensity': _get_col(skymap, 'PROBDENSITY'),
+        'distmu': _get_col(skymap, 'DISTMU'),
+        'distsigma': _get_col(skymap, 'DISTSIGMA'),
+        'distnorm': _get_col(skymap, 'DISTNORM'),
     }
 
     return skymap
 
 
+def _get_contour_order(skymap, max_order, min_pixels=1000):
+    """Get the lowest HEALPix order at which the 90% credible region of a
+    multi-order skymap still spans at least `min_pixels` pixels, capped at
+    `max_order`. The credible area is computed directly on the multi-order
+    map, without rasterizing it."""
+
+    dA = ligo.skymap.moc.uniq2pixarea(skymap['UNIQ'])
+    i = np.argsort(skymap['PROBDENSITY'])[::-1]
+    cumprob = np.cumsum(skymap['PROBDENSITY'][i] * dA[i])
+    if not cumprob[-1] > 0:
+        # no probability anywhere, so no credible region to size against
+        return max_order
+    n_90 = np.searchsorted(cumprob, 0.9 * cumprob[-1]) + 1
+    area_90 = dA[i][:n_90].sum()
+
+    # pixels at order k have an area of 4 pi / (12 * 4**k) steradians
+    order = np.ceil(0.5 * np.log2(4 * np.pi * min_pixels / (12 * area_90)))
+    return int(np.clip(order, 0, max_order))
+
+
 def get_contour(localization):
 
+    # Flatten the skymap only as finely as needed to resolve its 90% credible
+    # region: broad localizations do not need the full Localization.nside.
+    skymap = localization.table_2d
+    order = _get_contour_order(skymap, hp.nside2order(localization.nside))
+    prob = np.asarray(ligo_bayestar.rasterize(skymap, order)['PROB'])
+
     # Calculate credible levels.
-    prob = localization.flat_2d
     cls = 100 * ligo.skymap.postprocess.find_greedy_credible_levels(prob)
 
     # Construct contours and return as a GeoJSON feature collection.
     levels = [50, 90]
-    paths = ligo.skymap.postprocess.contour(cls, levels, degrees=True, simplify=True)
-    center = ligo.skymap.postprocess.posterior_max(prob)
+    paths = ligo.skymap.postprocess.contour(
+        cls, levels, nest=True, degrees=True, simplify=True
+    )
+
+    # Take the center from the highest density cell of the multi-order map,
+    # which does not depend on the resolution used for contouring.
+    center_order, center_ipix = ligo.skymap.moc.uniq2nest(
+        skymap['UNIQ'][np.argmax(skymap['PROBDENSITY'])]
+    )
+    center_ra, center_dec = hp.pix2ang(
+        hp.order2nside(int(center_order)), center_ipix, nest=True, lonlat=True
+    )
     localization.contour = {
         'type': 'FeatureCollection',
         'features': [
@@ -556,7 +646,7 @@ def get_contour(localization):
                 'type': 'Feature',
                 'geometry': {
                     'type': 'Point',
-                    'coordinates': [center.ra.deg, center.dec.deg],
+                    'coordinates': [float(center_ra), float(center_dec)],
                 },
                 'properties': {'credible_level': 0},
             }